@@ -35,6 +35,10 @@ features.  Clearly an interactive application can benefit by
 specifying its own completer function and using raw_input() for all
 its input.
 
+- Special names of the form __name__ are only completed once the text
+being completed starts with an underscore; set the module variable
+_HIDE_DUNDERS to False to always include them.
+
 - When the original stdin is not a tty device, GNU readline is never
 used, and this module (and the readline module) are silently inactive.
 
@@ -42,9 +46,53 @@ used, and this module (and the readline module) are silently inactive.
 
 import __builtin__
 import __main__
+import bisect
+import glob
+import itertools
+import keyword
+import os
+import re
+import stat
+import time
+from types import InstanceType as _InstanceType, ClassType as _ClassType
+
+# Sorted once at import time; global_matches() bisects into it.
+_KWLIST = tuple(sorted(keyword.kwlist))
+
+# NAME.NAME....[NAME]: group 1 is the object expression, group 2 the
+# attribute prefix being completed.
+_ATTR_RE = re.compile(r"(\w+(?:\.\w+)*)\.(\w*)")
 
 __all__ = ["Completer"]
 
+# callable() checks tp_call in C instead of going through hasattr(); unlike
+# hasattr(val, '__call__') it also counts old-style classes as callable.
+_callable = callable
+
+# Default for getattr() that no attribute can hold.
+_MISSING = object()
+
+# Maximum number of attribute name lists attr_matches() remembers.
+_ATTR_CACHE_SIZE = 32
+
+# Leave __special__ names out of the completions unless the text being
+# completed starts with an underscore itself.
+_HIDE_DUNDERS = True
+
+# Upper bound on the file names file_matches() returns; readline cannot
+# sensibly display more than this anyway.
+_MAX_FILE_MATCHES = 10000
+
+def _is_dunder(word):
+    return word[:2] == "__" and word[-2:] == "__"
+
+def _prefix_range(names, prefix):
+    """Return the names in the sorted sequence names starting with prefix."""
+    lo = hi = bisect.bisect_left(names, prefix)
+    while hi < len(names) and names[hi].startswith(prefix):
+        hi += 1
+    return names[lo:hi]
+
 class Completer:
     def __init__(self, namespace = None):
         """Create a new completer for the command line.
@@ -76,6 +124,20 @@ class Completer:
         # The cache of matches for a particular text fragment.
         self.matches = []
 
+        # Attribute names of recently completed objects, keyed by
+        # _attr_signature(), plus the keys in insertion order for FIFO
+        # eviction.
+        self._attr_cache = {}
+        self._attr_cache_order = []
+
+        # (length, sorted names) of __builtin__.__dict__; see
+        # _builtin_names().
+        self._builtin_cache = None
+
+        # (cwd, mtime, quote, matches) from the last completion of a bare
+        # quote, i.e. of every name in the current directory.
+        self._cwd_glob_cache = None
+
     def complete(self, text, state):
         """Return the next possible completion for 'text'.
 
@@ -115,80 +177,161 @@ class Completer:
         defined in self.namespace that match.
 
         """
-        import keyword
-        matches = []
-        n = len(text)
-        for word in keyword.kwlist:
-            if word[:n] == text:
-                matches.append(word)
-        for nspace in [__builtin__.__dict__, self.namespace]:
-            for word, val in nspace.items():
-                if word[:n] == text and word != "__builtins__":
-                    matches.append(self._callable_postfix(val, word))
+        matches = list(_prefix_range(_KWLIST, text))
+        # A global shadowing a built-in is offered once, for the global's
+        # value, so self.namespace is searched first.
+        seen = set()
+        hide = _HIDE_DUNDERS and not text.startswith("_")
+        # The user's namespace changes all the time and is scanned afresh,
+        # from a snapshot of its keys; the built-ins are bisected.
+        candidates = [
+            (self.namespace, [word for word in tuple(self.namespace)
+                              if word.startswith(text)]),
+            (__builtin__.__dict__, _prefix_range(self._builtin_names(), text)),
+            ]
+        for nspace, words in candidates:
+            for word in words:
+                if word == "__builtins__" or word in seen:
+                    continue
+                if hide and _is_dunder(word):
+                    continue
+                # values are only fetched for names that matched the prefix;
+                # a name deleted since the snapshot was taken is skipped
+                try:
+                    val = nspace[word]
+                except KeyError:
+                    continue
+                seen.add(word)
+                matches.append(word + "(" if _callable(val) else word)
         return matches
 
+    def _builtin_names(self):
+        """Return the names defined in __builtin__ as a sorted tuple.
+
+        The built-ins practically never change, so the tuple is only rebuilt
+        when the length of __builtin__.__dict__ does.  Being a snapshot, it
+        can be iterated safely even if completion runs code that changes the
+        dictionary.
+
+        """
+        nspace = __builtin__.__dict__
+        cache = self._builtin_cache
+        if cache is None or cache[0] != len(nspace):
+            cache = self._builtin_cache = (len(nspace), tuple(sorted(nspace)))
+        return cache[1]
+
     def attr_matches(self, text):
         """Compute matches when text contains a dot.
 
         Assuming the text is of the form NAME.NAME....[NAME], and is
         evaluatable in self.namespace, it will be evaluated and its attributes
         (as revealed by dir()) are used as possible completions.  (For class
-        instances, class members are also considered.)
+        instances, class members are also considered.)  Dotted names are
+        looked up as eval() would, in self.namespace and then in its
+        __builtins__, without compiling them; anything else, such as a
+        number, is still passed to eval().
 
         WARNING: this can still invoke arbitrary C code, if an object
         with a __getattr__ hook is evaluated.
 
         """
-        import re
-        import types
-
-        # Setup the regular expression for attributes
-        m = re.match(r"(\w+(\.\w+)*)\.(\w*)", text)
+        m = _ATTR_RE.match(text)
         if not m:
             return []
 
-        # Group 1 is the class name, group 3 is the attribute text
-        expr, attr = m.group(1, 3)
+        # Group 1 is the class name, group 2 is the attribute text
+        expr, attr = m.group(1, 2)
         try:
-            thisobject = eval(expr, self.namespace)
+            thisobject = self._lookup(expr)
         except Exception:
             return []
 
-        # get the content of the object, except __builtins__
-        words = dir(thisobject)
-        if "__builtins__" in words:
-            words.remove("__builtins__")
+        words = self._attr_words(thisobject)
 
-        # If this type is a class instance, use the __class__ member to
-        # get the dictionary of attributes
-        if type(thisobject) == types.InstanceType:
-            if hasattr(thisobject, '__class__'):
-                words.append('__class__')
-                words.extend(get_class_members(thisobject.__class__))
-        elif type(thisobject) == types.ClassType:
-            words.extend(get_class_members(thisobject))
-        else:
-            words.extend(dir(thisobject))
+        hide = _HIDE_DUNDERS and not attr.startswith("_")
 
         # Build the full matching text from class.attribute matches
         matches = []
-        n = len(attr)
-        for word in words:
-            if word[:n] == attr and hasattr(thisobject, word):
-                val = getattr(thisobject, word)
-                word = self._callable_postfix(val, "%s.%s" % (expr, word))
-                matches.append(word)
+        for word in _prefix_range(words, attr):
+            if hide and _is_dunder(word):
+                continue
+            # a single getattr() rather than hasattr() followed by getattr();
+            # like hasattr(), treat any error as a missing attribute
+            try:
+                val = getattr(thisobject, word, _MISSING)
+            except Exception:
+                continue
+            if val is _MISSING:
+                continue
+            word = "%s.%s" % (expr, word)
+            matches.append(word + "(" if _callable(val) else word)
         return matches
 
+    def _lookup(self, expr):
+        """Return the value of expr, a dotted name, in self.namespace."""
+        parts = expr.split('.')
+        if parts[0][:1].isdigit():
+            # e.g. "1.real": not a name, let eval() make sense of it
+            return eval(expr, self.namespace)
+        # a plain dotted name is looked up directly rather than compiling it
+        # with eval() on every keystroke
+        if parts[0] in self.namespace:
+            thisobject = self.namespace[parts[0]]
+        else:
+            builtins = self.namespace.get('__builtins__', __builtin__)
+            if isinstance(builtins, dict):
+                thisobject = builtins[parts[0]]
+            else:
+                thisobject = getattr(builtins, parts[0])
+        for part in parts[1:]:
+            thisobject = getattr(thisobject, part)
+        return thisobject
+
+    def _attr_words(self, thisobject):
+        """Return the candidate attribute names of thisobject, sorted.
+
+        readline calls the completer again for every character typed, so
+        the names are remembered, keyed by the names of the dictionaries
+        dir() draws them from (see _attr_signature()).  Any attribute added
+        to or removed from the object or one of its classes therefore gives
+        a new key; objects whose names come from elsewhere, e.g. a __dir__
+        method, are not cached.  No reference to the object itself is kept.
+
+        """
+        key = _attr_signature(thisobject)
+        if key is not None:
+            words = self._attr_cache.get(key)
+            if words is not None:
+                return words
+
+        # get the content of the object, except __builtins__; a set keeps
+        # the class members added below from producing duplicate matches
+        words = set(dir(thisobject))
+        words.discard("__builtins__")
+
+        # If this type is a class instance, use the __class__ member to
+        # get the dictionary of attributes
+        if isinstance(thisobject, _InstanceType):
+            if hasattr(thisobject, '__class__'):
+                words.add('__class__')
+                words.update(get_class_members(thisobject.__class__))
+        elif isinstance(thisobject, _ClassType):
+            words.update(get_class_members(thisobject))
+
+        words = tuple(sorted(words))
+        if key is not None:
+            self._attr_cache_order.append(key)
+            if len(self._attr_cache_order) > _ATTR_CACHE_SIZE:
+                del self._attr_cache[self._attr_cache_order.pop(0)]
+            self._attr_cache[key] = words
+        return words
+
     def file_matches(self, text):
         """Compute matches when text is a file name.
 
         Expects a leading single or double quote character in the text.
         Will expand a leading ~ or ~user to a valid home directory.
         Will expand a leading $VAR to an environment variable name."""
-        import glob
-        import os
-
         # save the leading quote character so we can re-add it later
         quote = text[0]
         # strip the leading quote character
@@ -198,30 +341,112 @@ class Completer:
         path = os.path.expanduser( path )
         path = os.path.expandvars( path )
 
+        # a bare quote lists the whole current directory; reuse that listing
+        # for as long as the directory itself is unchanged.  mtimes may only
+        # have one second resolution (HFS+), so a listing taken within two
+        # seconds of the last change is not trusted to be complete.
+        cwd_key = None
+        if not path:
+            try:
+                cwd = os.getcwd()
+                mtime = os.stat( cwd ).st_mtime
+            except OSError:
+                pass
+            else:
+                cwd_key = (cwd, mtime, quote)
+            cached = self._cwd_glob_cache
+            if cwd_key is not None and cached is not None \
+                   and cached[:3] == cwd_key:
+                return cached[3]
+
         # append the any match character to send to the glob routine
         path = path + "*"
 
-        # use the glob module to get all of the matches
-        rawMatches = glob.glob( path )
+        # let the glob module find the matches lazily, as they are consumed
+        rawMatches = itertools.islice( glob.iglob( path ), _MAX_FILE_MATCHES )
 
         # re-prefix the text with the quoting character and append the correct
         # terminating character depending on the type of match that was found.
         # Directories are terminated with '/' and files with an ending quote.
         matches = []
         for entry in rawMatches:
-            if os.path.isdir( entry ):
+            # one stat() per entry instead of isdir() followed by isfile()
+            try:
+                mode = os.stat( entry ).st_mode
+            except OSError:
+                matches.append( quote + entry )
+                continue
+            if stat.S_ISDIR( mode ):
                 matches.append( quote + entry + os.sep )
-            elif os.path.isfile( entry ):
+            elif stat.S_ISREG( mode ):
                 matches.append( quote + entry + quote )
             else:
                 matches.append( quote + entry )
+        if cwd_key is not None and time.time() - cwd_key[1] >= 2:
+            self._cwd_glob_cache = cwd_key + (matches,)
         return matches
 
+def _attr_signature(thisobject):
+    """Return the names dir(thisobject) is built from, as a hashable key.
+
+    The key holds the key set of the object's own __dict__ and of the
+    __dict__ of every class it gets attributes from, so it changes whenever
+    a name is bound or deleted on any of them.  None is returned when the
+    names cannot be worked out this way: the object has a __dir__ method,
+    a __getattr__ hook or __members__/__methods__ lists, its __class__ is
+    not its type, or looking at it raises.
+
+    """
+    try:
+        dicts = []
+        own = getattr(thisobject, '__dict__', None)
+        if own is not None:
+            dicts.append(own)
+        if isinstance(thisobject, _InstanceType):
+            classes = _old_style_bases(thisobject.__class__)
+        elif isinstance(thisobject, _ClassType):
+            classes = _old_style_bases(thisobject)
+        else:
+            # dir() follows __class__, which an object may override
+            if getattr(thisobject, '__class__', None) is not type(thisobject):
+                return None
+            classes = type(thisobject).__mro__
+            if isinstance(thisobject, type):
+                classes = thisobject.__mro__ + classes
+        for klass in classes:
+            dicts.append(klass.__dict__)
+        key = tuple([frozenset(d) for d in dicts])
+    except Exception:
+        return None
+    for names in key:
+        if '__dir__' in names or '__getattr__' in names \
+               or '__members__' in names or '__methods__' in names:
+            return None
+    return (type(thisobject) is _InstanceType,
+            type(thisobject) is _ClassType) + key
+
+def _old_style_bases(klass):
+    """Return the old-style class klass and all of its bases, each once."""
+    ret = []
+    stack = [klass]
+    seen = set()
+    while stack:
+        base = stack.pop()
+        if id(base) in seen:
+            continue
+        seen.add(id(base))
+        ret.append(base)
+        stack.extend(getattr(base, '__bases__', ()))
+    return ret
+
 def get_class_members(klass):
-    ret = dir(klass)
-    if hasattr(klass,'__bases__'):
-        for base in klass.__bases__:
-            ret = ret + get_class_members(base)
+    # dir() of a new-style class already covers its whole __mro__; old-style
+    # classes are walked by hand, visiting each shared base only once.
+    if hasattr(klass, '__mro__'):
+        return set(dir(klass))
+    ret = set()
+    for base in _old_style_bases(klass):
+        ret.update(dir(base))
     return ret
 
 try:
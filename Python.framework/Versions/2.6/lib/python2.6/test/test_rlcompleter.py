@@ -0,0 +1,76 @@
+"""
+  Test cases for the rlcompleter module
+"""
+
+import unittest
+from test.test_support import run_unittest
+import rlcompleter
+
+
+class Spam(object):
+    pass
+
+class Eggs(object):
+    names = ['alpha']
+    def __dir__(self):
+        return list(Eggs.names)
+
+
+class AttrCacheTests(unittest.TestCase):
+    # attr_matches() caches the names of the objects it completes; make
+    # sure the cached names follow changes to those objects.
+
+    def setUp(self):
+        self.spam = Spam()
+        self.completer = rlcompleter.Completer({'spam': self.spam,
+                                                'Spam': Spam,
+                                                'eggs': Eggs()})
+
+    def tearDown(self):
+        for name in ('zed', 'zeta'):
+            if name in Spam.__dict__:
+                delattr(Spam, name)
+        Eggs.names = ['alpha']
+
+    def test_instance_attribute_added(self):
+        self.assertEquals(self.completer.attr_matches('spam.z'), [])
+        self.spam.zed = 1
+        self.assertEquals(self.completer.attr_matches('spam.z'),
+                          ['spam.zed'])
+
+    def test_class_attribute_added(self):
+        self.assertEquals(self.completer.attr_matches('spam.z'), [])
+        Spam.zeta = 1
+        self.assertEquals(self.completer.attr_matches('spam.z'),
+                          ['spam.zeta'])
+        self.assertEquals(self.completer.attr_matches('Spam.z'),
+                          ['Spam.zeta'])
+
+    def test_attribute_replaced(self):
+        # same number of names, different names
+        self.spam.zed = 1
+        self.assertEquals(self.completer.attr_matches('spam.z'),
+                          ['spam.zed'])
+        del self.spam.zed
+        self.spam.zap = 1
+        self.assertEquals(self.completer.attr_matches('spam.z'),
+                          ['spam.zap'])
+
+    def test_dir_method(self):
+        Eggs.alpha = Eggs.beta = 1
+        try:
+            self.assertEquals(self.completer.attr_matches('eggs.'),
+                              ['eggs.alpha'])
+            Eggs.names.append('beta')
+            self.assertEquals(self.completer.attr_matches('eggs.'),
+                              ['eggs.alpha', 'eggs.beta'])
+        finally:
+            del Eggs.alpha, Eggs.beta
+
+
+def test_main():
+    run_unittest(AttrCacheTests)
+
+
+if __name__ == "__main__":
+    test_main()